@@ -36,7 +36,6 @@ def main():
         ("rich", "Rich"),
         ("yaml", "PyYAML"),
         ("aiohttp", "aiohttp"),
-        ("async_lru", "async-lru"),
         ("tyro", "tyro"),
         ("omegaconf", "OmegaConf"),
         ("pydantic", "Pydantic"),
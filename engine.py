@@ -4,29 +4,146 @@ import hashlib
 import os
 import io
 import asyncio
-from async_lru import alru_cache
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
 import base64
-from queue import Queue
+from queue import Queue, Empty
 from typing import Dict, Any, List, Optional, Union
 from functools import lru_cache
+from collections import OrderedDict
 import numpy as np
 import torch
 import torch.nn.functional as F
-from PIL import Image, ImageOps
+from PIL import Image
 
 from liveportrait.config.argument_config import ArgumentConfig
 from liveportrait.utils.camera import get_rotation_matrix
-from liveportrait.utils.io import resize_to_limit
+from liveportrait.utils.io import resize_to_limit, decode_and_resize
 from liveportrait.utils.crop import prepare_paste_back, paste_back, parse_bbox_from_landmark
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Configure logging (INFO by default: the per-transform traces are DEBUG and only
+# show up when the app's --debug flag lowers this logger)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 # Global constants
 DATA_ROOT = os.environ.get('DATA_ROOT', '/tmp/data')
 MODELS_DIR = os.path.join(DATA_ROOT, "models")
 
+# WebP settings for the transformed portrait, built once instead of per call.
+# The libwebp effort level (0-6) is a near log-linear time knob: 6 costs hundreds of
+# ms on a full-size portrait for a few percent smaller files, 2 is a few times faster.
+WEBP_METHOD = int(os.environ.get('FACEPOKE_WEBP_METHOD', '2'))
+WEBP_SAVE_KWARGS = dict(format="WebP", quality=82, lossless=False, method=WEBP_METHOD)
+# the 256x256 face crop alone (return_crop_only) is a live preview, quality matters less
+WEBP_CROP_SAVE_KWARGS = dict(WEBP_SAVE_KWARGS, quality=70)
+
+# Opt-in: script + freeze the LivePortrait sub-modules at startup (FACEPOKE_TORCHSCRIPT=1)
+USE_TORCHSCRIPT = os.environ.get('FACEPOKE_TORCHSCRIPT', '0') == '1'
+
+# Opt-in: torch.compile (inductor) the same sub-modules instead (FACEPOKE_COMPILE=1),
+# for setups where TorchScript is not used. Compilation happens lazily on the first
+# call for each shape, which is what Engine.warmup() is for.
+USE_TORCH_COMPILE = os.environ.get('FACEPOKE_COMPILE', '0') == '1'
+
+# Concurrent transforms are rendered together: the render thread waits up to
+# RENDER_BATCH_WINDOW_MS after the first pending request and runs at most
+# RENDER_BATCH_SIZE of them as one batch through stitching + warp_decode.
+RENDER_BATCH_SIZE = int(os.environ.get('FACEPOKE_BATCH_SIZE', '8'))
+RENDER_BATCH_WINDOW_MS = float(os.environ.get('FACEPOKE_BATCH_WINDOW_MS', '5'))
+
+# Number of implicit keypoints (motion_extractor_params.num_kp in models.yaml)
+NUM_KP = 21
+
+# Expression controls as keypoint offsets: (batch, keypoint, axis, factor) per unit of the
+# param. A (positive, non-positive) factor pair depends on the sign of the param value.
+# Adapted from https://github.com/PowerHouseMan/ComfyUI-AdvancedLivePortrait/blob/main/nodes.py#L408-L472
+EXPRESSION_MODIFICATIONS = [
+    ('smile', [
+        (0, 20, 1, -0.01), (0, 14, 1, -0.02), (0, 17, 1, 0.0065), (0, 17, 2, 0.003),
+        (0, 13, 1, -0.00275), (0, 16, 1, -0.00275), (0, 3, 1, -0.0035), (0, 7, 1, -0.0035)
+    ]),
+    ('mouth', [
+        (0, 19, 1, 0.001), (0, 19, 2, 0.0001), (0, 17, 1, -0.0001)
+    ]),
+    ('aaa', [
+        (0, 19, 1, 0.001), (0, 19, 2, 0.0001), (0, 17, 1, -0.0001)
+    ]),
+    ('eee', [
+        (0, 20, 2, -0.001), (0, 20, 1, -0.001), (0, 14, 1, -0.001)
+    ]),
+    ('woo', [
+        (0, 14, 1, 0.001), (0, 3, 1, -0.0005), (0, 7, 1, -0.0005), (0, 17, 2, -0.0005)
+    ]),
+    ('wink', [
+        (0, 11, 1, 0.001), (0, 13, 1, -0.0003), (0, 17, 0, 0.0003),
+        (0, 17, 1, 0.0003), (0, 3, 1, -0.0003)
+    ]),
+    ('blink', [
+        (0, 11, 1, -0.001), (0, 13, 1, 0.0003), (0, 15, 1, -0.001), (0, 16, 1, 0.0003),
+        (0, 1, 1, -0.00025), (0, 2, 1, 0.00025)
+    ]),
+    ('pupil_x', [
+        (0, 11, 0, (0.0007, 0.001)),
+        (0, 15, 0, (0.001, 0.0007))
+    ]),
+    ('pupil_y', [
+        (0, 11, 1, -0.001), (0, 15, 1, -0.001),
+        # pupil_y also affects the eyes (applied twice on purpose)
+        (0, 11, 1, -0.001), (0, 15, 1, -0.001)
+    ]),
+    ('eyes', [
+        (0, 11, 1, -0.001), (0, 13, 1, 0.0003), (0, 15, 1, -0.001), (0, 16, 1, 0.0003),
+        (0, 1, 1, -0.00025), (0, 2, 1, 0.00025)
+    ]),
+    ('eyebrow', [
+        (0, 1, 1, (0.001, 0.0003)),
+        (0, 2, 1, (-0.001, -0.0003)),
+        (0, 1, 0, (0, -0.001)),
+        (0, 2, 0, (0, 0.001))
+    ]),
+    # Some other ones: https://github.com/jbilcke-hf/FacePoke/issues/22#issuecomment-2408708028
+    # Still need to check how exactly we would control those in the UI,
+    # as we don't have yet segmentation in the frontend UI for those body parts
+    #('lower_lip', [
+    #    (0, 19, 1, 0.02)
+    #]),
+    #('upper_lip', [
+    #    (0, 20, 1, -0.01)
+    #]),
+    #('neck', [(0, 5, 1, 0.01)]),
+]
+
+# Every numeric param transform_image reads, in a fixed order: the expression
+# controls (rows of the expression basis) followed by the head rotation in degrees
+NUM_EXPRESSIONS = len(EXPRESSION_MODIFICATIONS)
+PARAM_ORDER = tuple(name for name, _ in EXPRESSION_MODIFICATIONS) + ('rotate_pitch', 'rotate_yaw', 'rotate_roll')
+PARAM_INDEX = {name: i for i, name in enumerate(PARAM_ORDER)}
+
+def build_expression_basis():
+    """
+    Turn EXPRESSION_MODIFICATIONS into dense per-param offset matrices, so that the
+    keypoint delta for a vector of param values is a single matmul.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (P, NUM_KP*3) offsets used when a param is
+            positive, and when it is zero or negative.
+    """
+    basis_pos = np.zeros((NUM_EXPRESSIONS, NUM_KP, 3), dtype=np.float32)
+    basis_nonpos = np.zeros_like(basis_pos)
+    for p, (_, adjustments) in enumerate(EXPRESSION_MODIFICATIONS):
+        for _, j, k, factor in adjustments:
+            pos, nonpos = factor if isinstance(factor, tuple) else (factor, factor)
+            basis_pos[p, j, k] += pos
+            basis_nonpos[p, j, k] += nonpos
+    return basis_pos.reshape(len(basis_pos), -1), basis_nonpos.reshape(len(basis_nonpos), -1)
+
+# LivePortraitWrapper attributes holding the models used on every request
+HOT_MODULES = ('appearance_feature_extractor', 'motion_extractor', 'warping_module', 'spade_generator')
+
 def base64_data_uri_to_PIL_Image(base64_string: str) -> Image.Image:
     """
     Convert a base64 data URI to a PIL Image.
@@ -60,49 +177,360 @@ class Engine:
             logger.info("  ✅ Live portrait setup complete")
 
             logger.info("  🔄 Configuring device settings...")
-            self.device = torch.device(live_portrait.live_portrait_wrapper.cfg.device_id)
+            self.device = live_portrait.live_portrait_wrapper.cfg.device
             if self.device.type == "cpu":
                 torch.set_num_threads(4)  # Limit number of threads for CPU
+            elif self.device.type == "cuda":
+                # input shapes are fixed, so let cuDNN autotune once and reuse the best algos
+                torch.backends.cudnn.benchmark = True
+                # whatever still runs in fp32 outside autocast (keypoint and rotation
+                # math) may use TF32 tensor cores on Ampere and newer
+                torch.backends.cuda.matmul.allow_tf32 = True
+                torch.backends.cudnn.allow_tf32 = True
             logger.info(f"  ✅ Device configuration complete (using {self.device})")
+
+            # Pinned staging buffer for the 256x256 source crop, reused across uploads
+            # so the host->device copy can be asynchronous and skip a pageable bounce
+            self._pinned_src = None
+            if self.device.type == "cuda":
+                h, w = live_portrait.live_portrait_wrapper.cfg.input_shape
+                self._pinned_src = torch.empty((1, h, w, 3), dtype=torch.uint8).pin_memory()
+                self._pinned_src_ready = torch.cuda.Event()
+                self._pinned_src_ready.record()
+                self._pinned_src_lock = threading.Lock()
             
+            # Worker processes for decoding encoded uploads, created on the first one
+            # (see _get_preproc_pool)
+            self._preproc_pool = None
+            self._preproc_pool_lock = threading.Lock()
+
+            basis_pos, basis_nonpos = build_expression_basis()
+            self._expr_basis_pos = torch.from_numpy(basis_pos).to(self.device)
+            self._expr_basis_nonpos = torch.from_numpy(basis_nonpos).to(self.device)
+
             logger.info("  🔄 Initializing cache...")
-            self.processed_cache = {}
+            self.processed_cache = OrderedDict()  # uid -> processed data, least recently used first
             self.max_cache_size = 10  # Limit cache size
+            self._evictions = 0
+            self.content_index = {}  # content hash of an upload -> uid in processed_cache
+            self._content_locks = {}  # content hash -> [asyncio.Lock, number of requests using it]
             logger.info("  ✅ Cache initialization complete")
 
-            # Add memory cleanup
-            import gc
-            gc.collect()
-            torch.cuda.empty_cache()
-            logger.info("  ✅ Memory cleanup complete")
+            # per-thread BytesIO reused for the WebP encodes, see _encode_webp
+            self._tls = threading.local()
+
+            # (f_s, x_s, x_d, future) waiting for the render thread, see _render_loop
+            self._render_queue = Queue()
+            self._render_thread = threading.Thread(target=self._render_loop, name="facepoke-render", daemon=True)
+            self._render_thread.start()
+
+            if USE_TORCHSCRIPT:
+                logger.info("  🔄 Scripting models...")
+                self._script_modules()
+                logger.info("  ✅ Model scripting complete")
+            elif USE_TORCH_COMPILE:
+                logger.info("  🔄 Compiling models...")
+                self._compile_modules()
+                logger.info("  ✅ Model compilation set up")
 
             logger.info("✅ FacePoke Engine initialized successfully")
         except Exception as e:
             logger.error(f"❌ Error during engine initialization: {str(e)}")
             raise
 
-    async def _process_image(self, data):
-        """Internal function to process an image and return the result"""
-        image = Image.open(io.BytesIO(data))
+    def _script_modules(self):
+        """
+        Replace the hot LivePortrait sub-modules with frozen, inference-optimized
+        TorchScript versions (conv-bn folding, constant propagation, no training
+        branches). A module that fails to script keeps running eagerly.
+        """
+        wrapper = self.live_portrait.live_portrait_wrapper
+
+        def _script(module):
+            module.eval()
+            scripted = torch.jit.freeze(torch.jit.script(module))
+            return torch.jit.optimize_for_inference(scripted)
+
+        for name in HOT_MODULES:
+            try:
+                setattr(wrapper, name, _script(getattr(wrapper, name)))
+            except Exception as e:
+                logger.warning(f"  ⚠️ Could not script {name}, keeping eager module: {str(e)}")
+
+        if wrapper.stitching_retargeting_module is not None:
+            try:
+                wrapper.stitching_retargeting_module['stitching'] = _script(wrapper.stitching_retargeting_module['stitching'])
+            except Exception as e:
+                logger.warning(f"  ⚠️ Could not script stitching module, keeping eager module: {str(e)}")
+
+    def _compile_modules(self):
+        """
+        Wrap the hot LivePortrait sub-modules with torch.compile (inductor fusions,
+        without CUDA graphs). A module that cannot be compiled keeps running eagerly.
+        """
+        if not hasattr(torch, 'compile'):
+            logger.warning("  ⚠️ torch.compile is not available in this PyTorch version, keeping eager modules")
+            return
+        if self.device.type == "mps":
+            # inductor has no complete MPS backend yet, a partial graph would fall back op by op
+            logger.warning("  ⚠️ torch.compile is not supported on MPS, keeping eager modules")
+            return
+
+        wrapper = self.live_portrait.live_portrait_wrapper
+
+        def _compile(module):
+            module.eval()
+            # No CUDA graphs ('reduce-overhead'): their outputs are overwritten by the next
+            # replay, while f_s / x_s_info are cached across requests, the modules are called
+            # from several threads and the render thread's batch size varies. dynamic=None
+            # lets a second batch size compile one shape-generic graph instead of one per size.
+            return torch.compile(module, mode='default', fullgraph=False, dynamic=None)
+
+        for name in HOT_MODULES:
+            try:
+                setattr(wrapper, name, _compile(getattr(wrapper, name)))
+            except Exception as e:
+                logger.warning(f"  ⚠️ Could not compile {name}, keeping eager module: {str(e)}")
+
+        if wrapper.stitching_retargeting_module is not None:
+            try:
+                wrapper.stitching_retargeting_module['stitching'] = _compile(wrapper.stitching_retargeting_module['stitching'])
+            except Exception as e:
+                logger.warning(f"  ⚠️ Could not compile stitching module, keeping eager module: {str(e)}")
+
+    async def warmup(self, iterations: int = 2):
+        """
+        Run the source and transform passes on a blank image so that cuDNN autotuning,
+        kernel loading, allocator growth and (with FACEPOKE_COMPILE=1) the torch.compile
+        compilation happen before the first real request. The passes go through the
+        wrapper's own autocast, so they compile for the same dtypes as real requests.
 
-        # keep the exif orientation (fix the selfie issue on iphone)
-        image = ImageOps.exif_transpose(image)
+        Args:
+            iterations (int): How many full passes to run.
+        """
+        wrapper = self.live_portrait.live_portrait_wrapper
+
+        def _run():
+            h, w = wrapper.cfg.input_shape
+            dummy = np.zeros((h, w, 3), dtype=np.uint8)
+            for _ in range(iterations):
+                I_s = self._prepare_source(dummy)
+                x_s_info, f_s, x_s = self._prepare_source_bundle(I_s)
+                x_d = wrapper.stitching(x_s, x_s)
+                out = wrapper.warp_decode(f_s, x_s, x_d)
+                wrapper.parse_output(out['out'])
+            if self.device.type == "cuda":
+                torch.cuda.synchronize()
+
+        logger.info("  🔄 Warming up models...")
+        await asyncio.to_thread(_run)
+        logger.info("  ✅ Warmup complete")
+
+    def _prepare_source_bundle(self, I_s: torch.Tensor):
+        """
+        Run every model pass needed for a source image in one go, with autograd fully off.
 
-        # Convert the image to RGB mode (removes alpha channel if present)
-        image = image.convert('RGB')
+        Args:
+            I_s (torch.Tensor): The prepared 1x3xHxW source crop.
 
-        uid = str(uuid.uuid4())
-        img_rgb = np.array(image)
+        Returns:
+            Tuple[dict, torch.Tensor, torch.Tensor]: The keypoint info (x_s_info), the
+                appearance feature volume (f_s) and the transformed source keypoints (x_s).
+        """
+        wrapper = self.live_portrait.live_portrait_wrapper
+        with torch.inference_mode():
+            x_s_info = wrapper.get_kp_info(I_s)
+            f_s = wrapper.extract_feature_3d(I_s)
+            x_s = wrapper.transform_keypoint(x_s_info)
+        return x_s_info, f_s, x_s
+
+    def _prepare_source(self, img: np.ndarray) -> torch.Tensor:
+        """
+        Upload a uint8 HxWx3 source crop to the device as a normalized 1x3xHxW tensor.
 
+        On CUDA the crop goes through the pinned staging buffer and is normalized on
+        the device; other devices (or unexpected shapes) use the wrapper's own path.
+        """
+        if self._pinned_src is None or img.shape != self._pinned_src.shape[1:]:
+            return self.live_portrait.live_portrait_wrapper.prepare_source(img)
+
+        with self._pinned_src_lock:
+            # the previous upload may still be reading from the staging buffer
+            self._pinned_src_ready.synchronize()
+            self._pinned_src[0].numpy()[...] = img
+            x = self._pinned_src.to(self.device, non_blocking=True)
+            self._pinned_src_ready.record()
+
+        return x.permute(0, 3, 1, 2).float().div_(255.)
+
+    def _submit_render(self, f_s: torch.Tensor, x_s: torch.Tensor, x_d: torch.Tensor) -> Future:
+        """
+        Queue one stitching + warp_decode + parse_output pass for the render thread.
+
+        Returns:
+            Future: Resolves to the 1xHxWx3 uint8 output (same as parse_output).
+        """
+        future = Future()
+        self._render_queue.put((f_s, x_s, x_d, future))
+        return future
+
+    def _render_loop(self):
+        """Render thread: collect pending transforms into batches and run them"""
+        window = RENDER_BATCH_WINDOW_MS / 1000.
+        while True:
+            batch = [self._render_queue.get()]
+            try:
+                # a lone request is rendered right away, the window only applies
+                # when other transforms are already queued behind it
+                if not self._render_queue.empty():
+                    deadline = time.monotonic() + window
+                    while len(batch) < RENDER_BATCH_SIZE:
+                        timeout = deadline - time.monotonic()
+                        try:
+                            # past the window, still take whatever is already waiting
+                            batch.append(self._render_queue.get(timeout=timeout) if timeout > 0 else self._render_queue.get_nowait())
+                        except Empty:
+                            break
+                self._render_batch(batch)
+            except Exception as e:
+                # never let the render thread die, or every later transform would hang
+                logger.error(f"Render batch failed: {str(e)}")
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _render_batch(self, batch):
+        """Run a batch of (f_s, x_s, x_d, future) through the models along dim 0"""
+        # drop the requests whose caller went away while they were queued
+        batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        wrapper = self.live_portrait.live_portrait_wrapper
+        try:
+            with torch.inference_mode():
+                f_s = torch.cat([item[0] for item in batch])
+                x_s = torch.cat([item[1] for item in batch])
+                x_d = torch.cat([item[2] for item in batch])
+                x_d = wrapper.stitching(x_s, x_d)
+                out = wrapper.warp_decode(f_s, x_s, x_d)
+                I_p = wrapper.parse_output(out['out'])
+        except Exception as e:
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+
+        if len(batch) > 1:
+            logger.debug("Rendered a batch of %d transforms", len(batch))
+        for i, (*_, future) in enumerate(batch):
+            future.set_result(I_p[i:i + 1])
+
+    def _encode_webp(self, image: Image.Image, save_kwargs: Dict[str, Any]) -> bytes:
+        """Encode an image to WebP bytes, reusing this thread's output buffer"""
+        buffered = getattr(self._tls, 'buf', None)
+        if buffered is None:
+            buffered = self._tls.buf = io.BytesIO()
+        buffered.seek(0)
+        buffered.truncate(0)
+        image.save(buffered, **save_kwargs)
+        return buffered.getvalue()
+
+    def _get_preproc_pool(self) -> ProcessPoolExecutor:
+        """
+        The worker processes for image decoding, spawned (never forked from a CUDA process).
+
+        Spawned workers re-import the launching script, so the pool is only created when
+        an encoded upload actually needs it; callers passing decoded arrays never start it.
+        """
+        with self._preproc_pool_lock:
+            if self._preproc_pool is None:
+                self._preproc_pool = ProcessPoolExecutor(
+                    max_workers=min(4, max(1, (os.cpu_count() or 2) // 2)),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._preproc_pool
+
+    def _cache_get(self, uid: str) -> Optional[Dict[str, Any]]:
+        """Look up a processed image and mark it as most recently used"""
+        processed_data = self.processed_cache.get(uid)
+        if processed_data is not None:
+            self.processed_cache.move_to_end(uid)
+        return processed_data
+
+    def _cache_put(self, uid: str, processed_data: Dict[str, Any]):
+        """Store a processed image, evicting the least recently used ones beyond max_cache_size"""
+        while len(self.processed_cache) >= self.max_cache_size:
+            evicted_uid, evicted = self.processed_cache.popitem(last=False)
+            if self.content_index.get(evicted.get('content_key')) == evicted_uid:
+                del self.content_index[evicted['content_key']]
+            # popping drops our references to its GPU tensors (f_s is a 32x16x64x64 volume);
+            # a transform still running on it keeps its own reference until it is done
+            self._evictions += 1
+            logger.debug("Evicted processed image %s from cache", evicted_uid)
+
+        if self.device.type == "cuda" and self._evictions >= self.max_cache_size:
+            # hand the freed blocks back to the driver now and then, not on every eviction
+            torch.cuda.empty_cache()
+            self._evictions = 0
+
+        self.processed_cache[uid] = processed_data
+
+    async def _process_image(self, data: Union[bytes, np.ndarray]):
+        """Internal function to process an image (encoded bytes or a decoded RGB array) and return the result"""
+        # the same picture uploaded again maps to the features we already extracted
+        if isinstance(data, np.ndarray):
+            # already decoded: hash the pixels (and the shape) instead of a file
+            data = np.ascontiguousarray(data)
+            hasher = hashlib.blake2b(str(data.shape).encode(), digest_size=16)
+            hasher.update(data)
+            content_key = hasher.digest()
+        else:
+            content_key = hashlib.blake2b(data, digest_size=16).digest()
+
+        # identical uploads arriving together wait for the first one instead of all
+        # running the source passes
+        entry = self._content_locks.get(content_key)
+        if entry is None:
+            entry = self._content_locks[content_key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                cached = self._cache_get(self.content_index.get(content_key))
+                if cached is not None:
+                    logger.debug("Reusing processed image %s for identical upload", cached['result']['uuid'])
+                    return dict(cached['result'])
+
+                return await self._process_new_image(data, content_key)
+        finally:
+            # only the last request holding or waiting for the lock drops it
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._content_locks[content_key]
+
+    async def _process_new_image(self, data: Union[bytes, np.ndarray], content_key: bytes):
+        """Run the full source pipeline on an upload that is not in the cache yet"""
         inference_cfg = self.live_portrait.live_portrait_wrapper.cfg
-        img_rgb = await asyncio.to_thread(resize_to_limit, img_rgb, inference_cfg.ref_max_shape, inference_cfg.ref_shape_n)
+
+        if isinstance(data, np.ndarray):
+            img_rgb = await asyncio.to_thread(resize_to_limit, data, inference_cfg.ref_max_shape, inference_cfg.ref_shape_n)
+        else:
+            # decoding + resizing a multi-MB upload is GIL-bound PIL/numpy work, so it runs
+            # in a worker process to keep both the event loop and model threads moving
+            img_rgb = await asyncio.get_running_loop().run_in_executor(
+                self._get_preproc_pool(), decode_and_resize, data, inference_cfg.ref_max_shape, inference_cfg.ref_shape_n
+            )
+
+        uid = str(uuid.uuid4())
         crop_info = await asyncio.to_thread(self.live_portrait.cropper.crop_single_image, img_rgb)
         img_crop_256x256 = crop_info['img_crop_256x256']
 
-        I_s = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.prepare_source, img_crop_256x256)
-        x_s_info = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.get_kp_info, I_s)
-        f_s = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.extract_feature_3d, I_s)
-        x_s = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.transform_keypoint, x_s_info)
+        I_s = await asyncio.to_thread(self._prepare_source, img_crop_256x256)
+        x_s_info, f_s, x_s = await asyncio.to_thread(self._prepare_source_bundle, I_s)
+
+        # the paste-back mask only depends on the source image, not on the params
+        mask_ori = await asyncio.to_thread(prepare_paste_back,
+            inference_cfg.mask_crop, crop_info['M_c2o'], dsize=(img_rgb.shape[1], img_rgb.shape[0])
+        )
 
         processed_data = {
             'img_rgb': img_rgb,
@@ -110,15 +538,14 @@ class Engine:
             'x_s_info': x_s_info,
             'f_s': f_s,
             'x_s': x_s,
+            'mask_ori': mask_ori,
             'inference_cfg': inference_cfg
         }
 
-        self.processed_cache[uid] = processed_data
-
         # Calculate the bounding box
         bbox_info = parse_bbox_from_landmark(processed_data['crop_info']['lmk_crop'], scale=1.0)
 
-        return {
+        result = {
             'u': uid,  # For web UI
             'uuid': uid,  # For API
             # Bounding box info needed by web UI
@@ -127,204 +554,105 @@ class Engine:
             'b': bbox_info['bbox'],    # 4x2
             'a': bbox_info['angle']     # rad, counterclockwise
         }
+        processed_data['result'] = result
+        processed_data['content_key'] = content_key
 
-    @alru_cache(maxsize=512)
-    async def load_image(self, data_str: str):
-        """Cached version for web UI that takes a string input"""
-        if isinstance(data_str, str) and ',' in data_str:
-            data = base64.b64decode(data_str.split(',')[1])
-        else:
-            data = data_str.encode() if isinstance(data_str, str) else data_str
-        return await self._process_image(data)
-
-    async def load_image_api(self, data: bytes):
-        """Non-cached version for API that takes bytes input"""
-        return await self._process_image(data)
-        
-    async def _load_image_impl(self, data):
-        logger.info("Starting image processing...")
-        try:
-            # Open and process the image
-            image = Image.open(io.BytesIO(data))
-            logger.info(f"Image opened successfully, format: {image.format}, size: {image.size}")
+        self._cache_put(uid, processed_data)
+        self.content_index[content_key] = uid
 
-            # keep the exif orientation (fix the selfie issue on iphone)
-            image = ImageOps.exif_transpose(image)
+        return dict(result)
 
-            # Convert the image to RGB mode (removes alpha channel if present)
-            image = image.convert('RGB')
-
-            uid = str(uuid.uuid4())
-            img_rgb = np.array(image)
+    async def load_image(self, data_str: Union[str, bytes, bytearray, memoryview]):
+        """
+        Version for web UI that takes a base64 data URI (or raw bytes).
 
-            inference_cfg = self.live_portrait.live_portrait_wrapper.cfg
-            img_rgb = await asyncio.to_thread(resize_to_limit, img_rgb, inference_cfg.ref_max_shape, inference_cfg.ref_shape_n)
-            crop_info = await asyncio.to_thread(self.live_portrait.cropper.crop_single_image, img_rgb)
-            img_crop_256x256 = crop_info['img_crop_256x256']
-            
-            # Prepare source image and get keypoint info
-            logger.info("Preparing source image...")
-            I_s = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.prepare_source, img_crop_256x256)
-            logger.info("Getting keypoint info...")
-            x_s_info = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.get_kp_info, I_s)
-            
-            # Transform keypoints and extract features
-            logger.info("Transforming keypoints...")
-            x_s = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.transform_keypoint, x_s_info)
-            
-            logger.info("Extracting features...")
-            f_s = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.extract_feature_3d, I_s)
-            
-            # Store processed data in cache
-            processed_data = {
-                'img_rgb': img_rgb,
-                'crop_info': crop_info,
-                'x_s_info': x_s_info,
-                'f_s': f_s,
-                'x_s': x_s,
-                'inference_cfg': inference_cfg
-            }
-
-            self.processed_cache[uid] = processed_data
-
-            # Calculate the bounding box
-            bbox_info = parse_bbox_from_landmark(processed_data['crop_info']['lmk_crop'], scale=1.0)
-
-            return {
-                'u': uid,
-
-                # those aren't easy to serialize
-                'c': bbox_info['center'], # 2x1
-                's': bbox_info['size'], # scalar
-                'b': bbox_info['bbox'],  # 4x2
-                'a': bbox_info['angle'],  # rad, counterclockwise
-                # 'bbox_rot': bbox_info['bbox_rot'].toList(),  # 4x2
-            }
-            
-        except Exception as e:
-            logger.error(f"Error processing image: {str(e)}")
-            raise
+        Repeated uploads are served from the cache, keyed by a hash of the decoded
+        bytes (see _process_image) rather than by the whole data URI.
+        """
+        if isinstance(data_str, (bytes, bytearray, memoryview)):
+            # raw binary upload, nothing to decode (bytes() is a no-op for bytes, and gives
+            # the preprocessing pool a picklable, hashable copy of the other buffers)
+            data = bytes(data_str)
+        elif ',' in data_str:
+            data = base64.b64decode(data_str.split(',')[1])
+        else:
+            data = data_str.encode()
+        return await self._process_image(data)
 
+    async def load_image_api(self, data: Union[bytes, bytearray, memoryview]):
+        """Version for API that takes raw image bytes (never base64)"""
+        return await self._process_image(bytes(data))
 
+    async def load_image_ndarray(self, img_rgb: np.ndarray):
+        """Version for in-process callers that already hold the decoded HxWx3 uint8 RGB image"""
+        return await self._process_image(img_rgb)
 
+    def _driving_keypoints(self, x_s_info: Dict[str, torch.Tensor], pv: List[float]) -> torch.Tensor:
+        """
+        Apply the expression offsets and the head rotation to the source keypoints.
 
+        Args:
+            x_s_info (Dict[str, torch.Tensor]): The keypoint info of the source image.
+            pv (List[float]): The param values, in PARAM_ORDER.
 
+        Returns:
+            torch.Tensor: The 1xNUM_KPx3 driving keypoints, before stitching.
+        """
+        with torch.inference_mode():
+            # Apply all expression offsets at once (see EXPRESSION_MODIFICATIONS)
+            values = torch.tensor(pv[:NUM_EXPRESSIONS], dtype=torch.float32).to(self.device)
+            basis = torch.where(values[:, None] > 0, self._expr_basis_pos, self._expr_basis_nonpos)
+            x_d_new = x_s_info['kp'] + (values @ basis).view(1, NUM_KP, 3)
 
+            # Special case for mouth affecting pitch rotation
+            rotate_pitch_adjustment = -pv[PARAM_INDEX['mouth']] * 0.05
 
+            # Special case for wink affecting roll and yaw rotation
+            rotate_roll_adjustment = -pv[PARAM_INDEX['wink']] * 0.1
+            rotate_yaw_adjustment = -pv[PARAM_INDEX['wink']] * 0.1
 
+            # Apply rotation
+            rotate_pitch, rotate_yaw, rotate_roll = pv[NUM_EXPRESSIONS:]
+            R_new = get_rotation_matrix(
+                x_s_info['pitch'] + rotate_pitch + rotate_pitch_adjustment,
+                x_s_info['yaw'] + rotate_yaw + rotate_yaw_adjustment,
+                x_s_info['roll'] + rotate_roll + rotate_roll_adjustment
+            )
+            return x_s_info['scale'] * (x_d_new @ R_new) + x_s_info['t']
 
+    async def transform_image(self, uid: str, params: Dict[str, float], *,
+                              webp_method: Optional[int] = None, webp_quality: Optional[int] = None) -> bytes:
+        """
+        Apply the params to a processed image and return the result as webp bytes.
 
-    async def transform_image(self, uid: str, params: Dict[str, float]) -> bytes:
-        logger.info(f"Transforming image {uid} with params: {params}")
+        webp_method / webp_quality override the default encoder settings (WEBP_SAVE_KWARGS),
+        e.g. a fast low effort encode for a live preview.
+        """
+        logger.debug("Transforming image %s with params: %s", uid, params)
         
         # If we don't have the image in cache yet, add it
-        if uid not in self.processed_cache:
-            logger.error(f"Image {uid} not found in cache. Available IDs: {list(self.processed_cache.keys())}")
+        processed_data = self._cache_get(uid)
+        if processed_data is None:
+            logger.error("Image %s not found in cache. Available IDs: %s", uid, list(self.processed_cache))
             raise ValueError("cache miss")
             
-        logger.info("Found image in cache, applying transformations...")
-
-        processed_data = self.processed_cache[uid]
+        logger.debug("Found image in cache, applying transformations...")
 
         try:
-            logger.info("Starting image transformation...")
-            logger.info(f"Cache data keys: {processed_data.keys()}")
+            logger.debug("Cache data keys: %s", processed_data.keys())
             
-            # Apply modifications based on params
-            x_d_new = processed_data['x_s_info']['kp'].clone()
-            logger.info("Cloned keypoints successfully")
-
-            # Adapted from https://github.com/PowerHouseMan/ComfyUI-AdvancedLivePortrait/blob/main/nodes.py#L408-L472
-            modifications = [
-                ('smile', [
-                    (0, 20, 1, -0.01), (0, 14, 1, -0.02), (0, 17, 1, 0.0065), (0, 17, 2, 0.003),
-                    (0, 13, 1, -0.00275), (0, 16, 1, -0.00275), (0, 3, 1, -0.0035), (0, 7, 1, -0.0035)
-                ]),
-                ('mouth', [
-                    (0, 19, 1, 0.001), (0, 19, 2, 0.0001), (0, 17, 1, -0.0001)
-                ]),
-                ('aaa', [
-                    (0, 19, 1, 0.001), (0, 19, 2, 0.0001), (0, 17, 1, -0.0001)
-                ]),
-                ('eee', [
-                    (0, 20, 2, -0.001), (0, 20, 1, -0.001), (0, 14, 1, -0.001)
-                ]),
-                ('woo', [
-                    (0, 14, 1, 0.001), (0, 3, 1, -0.0005), (0, 7, 1, -0.0005), (0, 17, 2, -0.0005)
-                ]),
-                ('wink', [
-                    (0, 11, 1, 0.001), (0, 13, 1, -0.0003), (0, 17, 0, 0.0003),
-                    (0, 17, 1, 0.0003), (0, 3, 1, -0.0003)
-                ]),
-                ('blink', [
-                    (0, 11, 1, -0.001), (0, 13, 1, 0.0003), (0, 15, 1, -0.001), (0, 16, 1, 0.0003),
-                    (0, 1, 1, -0.00025), (0, 2, 1, 0.00025)
-                ]),
-                ('pupil_x', [
-                    (0, 11, 0, 0.0007 if params.get('pupil_x', 0) > 0 else 0.001),
-                    (0, 15, 0, 0.001 if params.get('pupil_x', 0) > 0 else 0.0007)
-                ]),
-                ('pupil_y', [
-                    (0, 11, 1, -0.001), (0, 15, 1, -0.001)
-                ]),
-                ('eyes', [
-                    (0, 11, 1, -0.001), (0, 13, 1, 0.0003), (0, 15, 1, -0.001), (0, 16, 1, 0.0003),
-                    (0, 1, 1, -0.00025), (0, 2, 1, 0.00025)
-                ]),
-                ('eyebrow', [
-                    (0, 1, 1, 0.001 if params.get('eyebrow', 0) > 0 else 0.0003),
-                    (0, 2, 1, -0.001 if params.get('eyebrow', 0) > 0 else -0.0003),
-                    (0, 1, 0, -0.001 if params.get('eyebrow', 0) <= 0 else 0),
-                    (0, 2, 0, 0.001 if params.get('eyebrow', 0) <= 0 else 0)
-                ]),
-                # Some other ones: https://github.com/jbilcke-hf/FacePoke/issues/22#issuecomment-2408708028
-                # Still need to check how exactly we would control those in the UI,
-                # as we don't have yet segmentation in the frontend UI for those body parts
-                #('lower_lip', [
-                #    (0, 19, 1, 0.02)
-                #]),
-                #('upper_lip', [
-                #    (0, 20, 1, -0.01)
-                #]),
-                #('neck', [(0, 5, 1, 0.01)]),
-            ]
-
-            for param_name, adjustments in modifications:
-                param_value = params.get(param_name, 0)
-                for i, j, k, factor in adjustments:
-                    x_d_new[i, j, k] += param_value * factor
-
-            # Special case for pupil_y affecting eyes
-            x_d_new[0, 11, 1] -= params.get('pupil_y', 0) * 0.001
-            x_d_new[0, 15, 1] -= params.get('pupil_y', 0) * 0.001
-            params['eyes'] = params.get('eyes', 0) - params.get('pupil_y', 0) / 2.
+            # Read the params once, in PARAM_ORDER
+            pv = [float(params.get(name, 0)) for name in PARAM_ORDER]
 
-            # Special case for mouth affecting pitch rotation
-            rotate_pitch_adjustment = -params.get('mouth', 0) * 0.05
-            
-            # Special case for wink affecting roll and yaw rotation
-            rotate_roll_adjustment = -params.get('wink', 0) * 0.1
-            rotate_yaw_adjustment = -params.get('wink', 0) * 0.1
+            # Apply modifications based on params (off the event loop, like every torch call)
+            x_d_new = await asyncio.to_thread(self._driving_keypoints, processed_data['x_s_info'], pv)
 
-
-            # Apply rotation
-            R_new = get_rotation_matrix(
-                processed_data['x_s_info']['pitch'] + params.get('rotate_pitch', 0) + rotate_pitch_adjustment,
-                processed_data['x_s_info']['yaw'] + params.get('rotate_yaw', 0) + rotate_yaw_adjustment,
-                processed_data['x_s_info']['roll'] + params.get('rotate_roll', 0) + rotate_roll_adjustment
+            # stitching, warp_decode and parse_output run on the render thread,
+            # batched with any other transform submitted at the same time
+            logger.debug("Generating output...")
+            I_p = await asyncio.wrap_future(
+                self._submit_render(processed_data['f_s'], processed_data['x_s'], x_d_new)
             )
-            x_d_new = processed_data['x_s_info']['scale'] * (x_d_new @ R_new) + processed_data['x_s_info']['t']
-
-            logger.info("Applying stitching...")
-            x_d_new = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.stitching, processed_data['x_s'], x_d_new)
-            logger.info("Stitching complete")
-
-            logger.info("Generating output...")
-            out = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.warp_decode, processed_data['f_s'], processed_data['x_s'], x_d_new)
-            logger.info("Parsing output...")
-            I_p = await asyncio.to_thread(self.live_portrait.live_portrait_wrapper.parse_output, out['out'])
-
-            buffered = io.BytesIO()
 
             ####################################################
             # this part is about stitching the image back into the original.
@@ -334,24 +662,27 @@ class Engine:
             #
             # I'm currently running some experiments to do it in the frontend
             #
-            #  --- old way: we do it in the server-side: ---
-            mask_ori = await asyncio.to_thread(prepare_paste_back,
-                processed_data['inference_cfg'].mask_crop, processed_data['crop_info']['M_c2o'],
-                dsize=(processed_data['img_rgb'].shape[1], processed_data['img_rgb'].shape[0])
-            )
-            I_p_to_ori_blend = await asyncio.to_thread(paste_back,
-                I_p[0], processed_data['crop_info']['M_c2o'], processed_data['img_rgb'], mask_ori
-            )
-            result_image = Image.fromarray(I_p_to_ori_blend)
-
-            # --- maybe future way: do it in the frontend: ---
-            #result_image = Image.fromarray(I_p[0])
+            # Callers that composite in the frontend pass params['return_crop_only']=True
+            # to skip the paste-back and only get the (much smaller) face crop.
+            if params.get('return_crop_only', False):
+                result_image = Image.fromarray(I_p[0])
+                save_kwargs = WEBP_CROP_SAVE_KWARGS
+            else:
+                # (the mask is prepared once per source image in _process_image)
+                I_p_to_ori_blend = await asyncio.to_thread(paste_back,
+                    I_p[0], processed_data['crop_info']['M_c2o'], processed_data['img_rgb'], processed_data['mask_ori']
+                )
+                result_image = Image.fromarray(I_p_to_ori_blend)
+                save_kwargs = WEBP_SAVE_KWARGS
             ####################################################
 
-            # write it into a webp
-            result_image.save(buffered, format="WebP", quality=82, lossless=False, method=6)
+            if webp_method is not None:
+                save_kwargs = dict(save_kwargs, method=webp_method)
+            if webp_quality is not None:
+                save_kwargs = dict(save_kwargs, quality=webp_quality)
 
-            return buffered.getvalue()
+            # write it into a webp
+            return await asyncio.to_thread(self._encode_webp, result_image, save_kwargs)
 
         except Exception as e:
             raise ValueError(f"Failed to modify image: {str(e)}")
@@ -5,16 +5,35 @@ A clean, simple interface for the FacePoke portrait animation system.
 """
 
 import os
+import faulthandler
+# Dump a C-level traceback to stderr if a native extension (CUDA, ONNX Runtime)
+# crashes, without replacing the default core-dumping behavior
+faulthandler.enable()
+
 # Enable MPS fallback to CPU for unsupported operations
 os.environ['PYTORCH_ENABLE_MPS_FALLBACK'] = '1'
+# Tune the CUDA caching allocator for long-lived sessions with variably-sized uploads
+# (must be set before torch is imported; an explicit user setting wins)
+os.environ.setdefault(
+    'PYTORCH_CUDA_ALLOC_CONF',
+    'max_split_size_mb:256,roundup_power2_divisions:8,garbage_collection_threshold:0.8'
+)
 
 import gradio as gr
 import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-import io
+import numpy as np
 import sys
 import argparse
+import tempfile
+import atexit
+import shutil
+import uuid
+from collections import deque
+from types import MappingProxyType
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -30,6 +49,43 @@ logger = logging.getLogger(__name__)
 live_portrait = None
 engine = None
 
+# One event loop for every engine call, running for the lifetime of the app in its own
+# thread: the Gradio handlers are sync functions on worker threads and hand their
+# coroutines over with _run() instead of building and tearing down a loop per click
+_LOOP = asyncio.new_event_loop()
+threading.Thread(target=_LOOP.run_forever, name="facepoke-engine-loop", daemon=True).start()
+
+# Blocking work around the engine calls (RGB conversion, writing the webp result)
+_POOL = ThreadPoolExecutor(max_workers=max(2, (os.cpu_count() or 2) // 2), thread_name_prefix='facepoke-io')
+
+# The webp results are handed to Gradio as files, so the browser gets the engine's
+# encode as-is; only the most recent ones are kept on disk (see _get_result_dir)
+_RESULT_DIR = None
+_RESULT_DIR_LOCK = threading.Lock()
+_RESULT_FILES = deque()
+MAX_RESULT_FILES = 32
+
+def _get_result_dir():
+    """Create the results directory on first use, removed again when the process exits"""
+    global _RESULT_DIR
+    with _RESULT_DIR_LOCK:
+        if _RESULT_DIR is None:
+            _RESULT_DIR = tempfile.mkdtemp(prefix='facepoke-results-')
+            atexit.register(shutil.rmtree, _RESULT_DIR, ignore_errors=True)
+        return _RESULT_DIR
+
+def _run(coro):
+    """Run a coroutine on the engine loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _LOOP).result()
+
+# The result is only shown in the browser preview, so favour encoding speed
+# (libwebp method 0 is several times faster than the engine default)
+PREVIEW_WEBP_METHOD = 0
+PREVIEW_WEBP_QUALITY = 80
+
+# Resolved once here (and by the CLI below), then handed to the model loader
+FORCE_CPU = os.environ.get('FACEPOKE_FORCE_CPU', '0') == '1'
+
 # Emotion presets
 EMOTION_PARAMS = {
     'Happy': {
@@ -162,67 +218,133 @@ EMOTION_PARAMS = {
     }
 }
 
+# Presets are built once at import and handed to the engine on every click,
+# so freeze them to keep a transform from ever mutating the shared values
+EMOTION_PARAMS = MappingProxyType({
+    name: MappingProxyType(params) for name, params in EMOTION_PARAMS.items()
+})
+EMOTION_NAMES = tuple(EMOTION_PARAMS)
+
+# Order of the custom edit sliders (the outputs of update_sliders_from_emotion)
+PARAM_ORDER = (
+    'rotate_pitch', 'rotate_yaw', 'rotate_roll', 'blink', 'eyebrow', 'wink', 'eyes',
+    'eee', 'aaa', 'woo', 'smile', 'mouth', 'pupil_x', 'pupil_y'
+)
+
+# Presets as one (n_emotions, n_params) table, and the slider values per preset built
+# once from it (float64 so slider values like -18.60 round-trip exactly)
+EMOTION_MATRIX = np.array(
+    [[EMOTION_PARAMS[name][key] for key in PARAM_ORDER] for name in EMOTION_NAMES], dtype=np.float64
+)
+EMOTION_TUPLES = MappingProxyType({
+    name: tuple(float(v) for v in EMOTION_MATRIX[i]) for i, name in enumerate(EMOTION_NAMES)
+})
+ZERO_TUPLE = (0,) * len(PARAM_ORDER)
+
+# Model loading happens once, on the engine loop (see start_model_initialization)
+_init_lock = asyncio.Lock()
+_init_status = None
+_init_future = None
+
 async def initialize_models_async():
-    """Initialize models asynchronously"""
-    global live_portrait, engine
-    try:
-        logger.info("Initializing models...")
-        live_portrait = await initialize_models()
-        engine = Engine(live_portrait=live_portrait)
-        
-        # Get device information
-        device_info = str(engine.device)
-        logger.info(f"✅ Models initialized successfully on {device_info}")
-        
-        return f"✅ Models initialized successfully on {device_info}"
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize models: {str(e)}")
-        raise
+    """Initialize models asynchronously (only the first call does the work)"""
+    global live_portrait, engine, _init_status
+    async with _init_lock:
+        if _init_status is not None:
+            return _init_status
+        try:
+            logger.info("Initializing models...")
+            live_portrait = await initialize_models(force_cpu=FORCE_CPU)
+            engine = Engine(live_portrait=live_portrait)
+            await engine.warmup()
+            
+            # Get device information
+            device_info = str(engine.device)
+            logger.info(f"✅ Models initialized successfully on {device_info}")
+            
+            _init_status = f"✅ Models initialized successfully on {device_info}"
+            return _init_status
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize models: {str(e)}")
+            raise
 
-def apply_emotion(image, emotion_name):
-    """Apply preset emotion to the uploaded image"""
+def start_model_initialization():
+    """Start loading the models in the background, once, and return the future for it"""
+    global _init_future
+    if _init_future is None:
+        _init_future = asyncio.run_coroutine_threadsafe(initialize_models_async(), _LOOP)
+        _init_future.add_done_callback(_forget_failed_initialization)
+    return _init_future
+
+def _forget_failed_initialization(future):
+    """Let the next page load retry after a failed model load"""
+    global _init_future
+    if (future.cancelled() or future.exception() is not None) and _init_future is future:
+        _init_future = None
+
+def wait_for_models():
+    """Block until the models are loaded and report the device (for the page load event,
+    starting the load if launch didn't)"""
+    return start_model_initialization().result()
+
+def _to_rgb_array(image):
+    """HxWx3 uint8 array of a PIL image, no larger than the engine's source size limit"""
+    # (gr.Image already applies the exif orientation to type='pil' inputs)
+    # Bounded here to the limit the engine would downscale to anyway (InferenceConfig.ref_max_shape)
+    max_dim = engine.live_portrait.live_portrait_wrapper.cfg.ref_max_shape
+    if max(image.size) > max_dim:
+        scale = max_dim / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.BILINEAR)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image)
+
+def _write_result(webp_bytes):
+    """Store a webp result in the results directory and return its path"""
+    path = os.path.join(_get_result_dir(), f"{uuid.uuid4().hex}.webp")
+    with open(path, 'wb') as f:
+        f.write(webp_bytes)
+    _RESULT_FILES.append(path)
+    # Gradio has copied older results into its own cache by now
+    while len(_RESULT_FILES) > MAX_RESULT_FILES:
+        try:
+            os.remove(_RESULT_FILES.popleft())
+        except (IndexError, OSError):
+            # another writer trimmed it first, or the file is already gone
+            pass
+    return path
+
+async def _load_and_transform(image, params):
+    """Load a PIL image into the engine and transform it, returning the path of the webp result"""
+    loop = asyncio.get_running_loop()
+    # Hand the decoded pixels over as-is (no PNG encode just to be decoded again)
+    img_rgb = await loop.run_in_executor(_POOL, _to_rgb_array, image)
+    logger.debug("Loading %dx%d image", img_rgb.shape[1], img_rgb.shape[0])
+    res = await engine.load_image_ndarray(img_rgb)
+    webp_bytes = await engine.transform_image(
+        res['uuid'], params, webp_method=PREVIEW_WEBP_METHOD, webp_quality=PREVIEW_WEBP_QUALITY
+    )
+    return await loop.run_in_executor(_POOL, _write_result, webp_bytes)
+
+def prepare_image(image):
+    """Extract the source features as soon as an image is uploaded"""
     global engine
     
-    if engine is None:
-        return None, "❌ Models not initialized. Please wait for initialization to complete."
-    
-    if image is None:
-        return None, "❌ Please upload an image first."
-    
-    if emotion_name not in EMOTION_PARAMS:
-        return None, f"❌ Invalid emotion: {emotion_name}"
+    if engine is None or image is None:
+        return gr.update()
     
     try:
-        # Convert PIL image to bytes
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        img_byte_arr = img_byte_arr.getvalue()
-        
-        # Load image into engine
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            res = loop.run_until_complete(engine.load_image_api(img_byte_arr))
-            
-            # Apply emotion transformation
-            webp_bytes = loop.run_until_complete(
-                engine.transform_image(res['uuid'], EMOTION_PARAMS[emotion_name])
-            )
-            
-            # Convert webp bytes back to PIL image
-            result_image = Image.open(io.BytesIO(webp_bytes))
-            
-            return result_image, f"✅ Applied {emotion_name} emotion successfully!"
-            
-        finally:
-            loop.close()
-            
+        # the engine caches by content, so the next Apply click only runs the transform
+        res = _run(engine.load_image_ndarray(_to_rgb_array(image)))
+        logger.debug("Prepared uploaded image %s", res['uuid'])
+        return "✅ Image ready, pick an emotion or adjust the sliders"
     except Exception as e:
-        logger.error(f"Error applying emotion: {str(e)}")
-        return None, f"❌ Error: {str(e)}"
+        logger.error(f"Error preparing image: {str(e)}")
+        return f"❌ Error: {str(e)}"
 
-def apply_custom_edits(image, rotate_pitch, rotate_yaw, rotate_roll, blink, eyebrow, wink, eyes, eee, aaa, woo, smile, mouth, pupil_x, pupil_y):
-    """Apply custom edits using slider values"""
+def _apply(image, params, description):
+    """Shared body of the Apply handlers: transform the image with the given params"""
     global engine
     
     if engine is None:
@@ -231,74 +353,30 @@ def apply_custom_edits(image, rotate_pitch, rotate_yaw, rotate_roll, blink, eyeb
     if image is None:
         return None, "❌ Please upload an image first."
     
-    # Create custom emotion parameters from sliders
-    custom_params = {
-        'rotate_pitch': rotate_pitch,
-        'rotate_yaw': rotate_yaw,
-        'rotate_roll': rotate_roll,
-        'blink': blink,
-        'eyebrow': eyebrow,
-        'wink': wink,
-        'eyes': eyes,
-        'eee': eee,
-        'aaa': aaa,
-        'woo': woo,
-        'smile': smile,
-        'mouth': mouth,
-        'pupil_x': pupil_x,
-        'pupil_y': pupil_y
-    }
-    
     try:
-        # Convert PIL image to bytes
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        img_byte_arr = img_byte_arr.getvalue()
+        # Load image into engine and apply the transformation, in one hop to the engine loop
+        result_image = _run(_load_and_transform(image, params))
         
-        # Load image into engine
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            res = loop.run_until_complete(engine.load_image_api(img_byte_arr))
-            
-            # Apply emotion transformation
-            webp_bytes = loop.run_until_complete(
-                engine.transform_image(res['uuid'], custom_params)
-            )
-            
-            # Convert webp bytes back to PIL image
-            result_image = Image.open(io.BytesIO(webp_bytes))
-            
-            return result_image, f"✅ Applied custom edits successfully!"
-            
-        finally:
-            loop.close()
+        return result_image, f"✅ Applied {description} successfully!"
             
     except Exception as e:
-        logger.error(f"Error applying custom edits: {str(e)}")
+        logger.error(f"Error applying {description}: {str(e)}")
         return None, f"❌ Error: {str(e)}"
 
+def apply_emotion(image, emotion_name):
+    """Apply preset emotion to the uploaded image"""
+    if emotion_name not in EMOTION_PARAMS:
+        return None, f"❌ Invalid emotion: {emotion_name}"
+    
+    return _apply(image, EMOTION_PARAMS[emotion_name], f"{emotion_name} emotion")
+
+def apply_custom_edits(image, *slider_values):
+    """Apply custom edits using slider values (in PARAM_ORDER)"""
+    return _apply(image, dict(zip(PARAM_ORDER, slider_values)), "custom edits")
+
 def update_sliders_from_emotion(emotion_name):
     """Update slider values when emotion is selected"""
-    if emotion_name in EMOTION_PARAMS:
-        params = EMOTION_PARAMS[emotion_name]
-        return (
-            params['rotate_pitch'],
-            params['rotate_yaw'],
-            params['rotate_roll'],
-            params['blink'],
-            params['eyebrow'],
-            params['wink'],
-            params['eyes'],
-            params['eee'],
-            params['aaa'],
-            params['woo'],
-            params['smile'],
-            params['mouth'],
-            params['pupil_x'],
-            params['pupil_y']
-        )
-    return (0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    return EMOTION_TUPLES.get(emotion_name, ZERO_TUPLE)
 
 def create_interface():
     """Create the Gradio interface"""
@@ -340,7 +418,7 @@ def create_interface():
                 # Emotion section
                 gr.Markdown("### 🎭 Preset Emotions")
                 emotion_dropdown = gr.Dropdown(
-                    choices=list(EMOTION_PARAMS.keys()),
+                    choices=list(EMOTION_NAMES),
                     value="Happy",
                     label="Choose Emotion",
                     info="Select the emotion to apply to your portrait"
@@ -363,6 +441,7 @@ def create_interface():
                 gr.Markdown("### 🎨 Result")
                 output_image = gr.Image(
                     label="Animated Portrait",
+                    type="filepath",
                     height=300
                 )
         
@@ -477,16 +556,35 @@ def create_interface():
         """)
         
         # Event handlers
+        # (the events that run the models share one "gpu" concurrency group with a
+        # single worker, so uploads and transforms never contend for the device)
+        input_image.upload(
+            fn=prepare_image,
+            inputs=[input_image],
+            outputs=[status_text],
+            trigger_mode="always_last",
+            concurrency_id="gpu",
+            concurrency_limit=1
+        )
+        
+        # (always_last: clicks made while a transform is running collapse into a
+        # single re-run with the latest inputs instead of queueing one run each)
         apply_emotion_btn.click(
             fn=apply_emotion,
             inputs=[input_image, emotion_dropdown],
-            outputs=[output_image, status_text]
+            outputs=[output_image, status_text],
+            trigger_mode="always_last",
+            concurrency_id="gpu",
+            concurrency_limit=1
         )
         
         apply_edits_btn.click(
             fn=apply_custom_edits,
             inputs=[input_image, rotate_pitch, rotate_yaw, rotate_roll, blink, eyebrow, wink, eyes, eee, aaa, woo, smile, mouth, pupil_x, pupil_y],
-            outputs=[output_image, status_text]
+            outputs=[output_image, status_text],
+            trigger_mode="always_last",
+            concurrency_id="gpu",
+            concurrency_limit=1
         )
         
         # Update sliders when emotion is selected
@@ -496,8 +594,18 @@ def create_interface():
             outputs=[rotate_pitch, rotate_yaw, rotate_roll, blink, eyebrow, wink, eyes, eee, aaa, woo, smile, mouth, pupil_x, pupil_y]
         )
         
-        # Initialize models on startup
-        interface.load(initialize_models_async, outputs=device_info)
+        # Show the device once the models (loading since startup) are ready; the wait runs
+        # in its own unlimited group so it never holds a slot Apply clicks are queued for
+        interface.load(
+            wait_for_models,
+            outputs=device_info,
+            concurrency_id="models",
+            concurrency_limit=None
+        )
+    
+    # One worker per event by default (the model events also share the "gpu" group
+    # above), and a bounded backlog keeps queued clicks from piling up unbounded latency
+    interface.queue(default_concurrency_limit=1, max_size=16)
     
     return interface
 
@@ -569,27 +677,28 @@ if __name__ == "__main__":
     # Parse command line arguments
     args = parse_arguments()
     
-    # Configure logging based on arguments
-    if args.debug:
-        logging.getLogger().setLevel(logging.DEBUG)
-    elif args.quiet:
-        logging.getLogger().setLevel(logging.WARNING)
+    # Configure logging based on arguments (the engine and loader loggers are pinned
+    # to INFO, so they are adjusted along with the root logger)
+    if args.debug or args.quiet:
+        level = logging.DEBUG if args.debug else logging.WARNING
+        for name in (None, 'engine', 'loader'):
+            logging.getLogger(name).setLevel(level)
     
     # Initialize models
     logger.info("Starting FacePoke Gradio app...")
     
-    # Check for CPU flag
-    force_cpu = args.force_cpu or os.environ.get('FACEPOKE_FORCE_CPU', '0') == '1'
-    if force_cpu:
-        logger.info("🔧 Forcing CPU usage as requested")
-        os.environ['FACEPOKE_FORCE_CPU'] = '1'
+    # Check for CPU flag (the device itself is resolved and logged by the model loader)
+    FORCE_CPU = args.force_cpu or FORCE_CPU
     
     # Log startup configuration
     logger.info(f"Server configuration: {args.host}:{args.port}")
     logger.info(f"Public sharing: {'Enabled' if args.share else 'Disabled'}")
-    logger.info(f"Force CPU: {'Yes' if force_cpu else 'No'}")
+    logger.info(f"Force CPU: {'Yes' if FORCE_CPU else 'No'}")
     logger.info(f"Debug mode: {'Enabled' if args.debug else 'Disabled'}")
     
+    # Load the models while the server starts, instead of on the first page load
+    start_model_initialization()
+    
     # Create and launch interface
     interface = create_interface()
     interface.launch(
@@ -6,6 +6,7 @@ pretty printing class
 
 from __future__ import annotations
 import os.path as osp
+from dataclasses import fields, is_dataclass
 from typing import Tuple
 
 
@@ -16,9 +17,13 @@ def make_abs_path(fn):
 class PrintableConfig:  # pylint: disable=too-few-public-methods
     """Printable Config defining str function"""
 
+    __slots__ = ()  # lets subclasses declared with slots=True do without an instance dict
+
     def __repr__(self):
         lines = [self.__class__.__name__ + ":"]
-        for key, val in vars(self).items():
+        # slotted dataclasses have no __dict__, so read their fields instead
+        items = ((f.name, getattr(self, f.name)) for f in fields(self)) if is_dataclass(self) else vars(self).items()
+        for key, val in items:
             if isinstance(val, Tuple):
                 flattened_val = "["
                 for item in val:
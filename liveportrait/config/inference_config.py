@@ -7,9 +7,13 @@ config dataclass used for inference
 import os
 import os.path as osp
 import logging
-from dataclasses import dataclass
-from typing import Literal, Tuple
+import warnings
+from dataclasses import dataclass, field
+from typing import Literal, Optional, Tuple
+import numpy as np
+import torch
 from .base_config import PrintableConfig, make_abs_path
+from ..utils.device_resolver import resolve_device
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -19,45 +23,45 @@ logger = logging.getLogger(__name__)
 DATA_ROOT = os.environ.get('DATA_ROOT', '/tmp/data')
 MODELS_DIR = os.path.join(DATA_ROOT, "models")
 
-@dataclass(repr=False)  # use repr from PrintableConfig
+@dataclass(repr=False, slots=True)  # use repr from PrintableConfig
 class InferenceConfig(PrintableConfig):
     models_config: str = make_abs_path('./models.yaml')  # portrait animation config
-    checkpoint_F = os.path.join(MODELS_DIR, "liveportrait", "appearance_feature_extractor.pth")
-    checkpoint_M = os.path.join(MODELS_DIR, "liveportrait", "motion_extractor.pth")
-    checkpoint_W = os.path.join(MODELS_DIR, "liveportrait", "warping_module.pth")
-    checkpoint_G = os.path.join(MODELS_DIR, "liveportrait", "spade_generator.pth")
-    checkpoint_S = os.path.join(MODELS_DIR, "liveportrait", "stitching_retargeting_module.pth")
+    checkpoint_F: str = os.path.join(MODELS_DIR, "liveportrait", "appearance_feature_extractor.pth")
+    checkpoint_M: str = os.path.join(MODELS_DIR, "liveportrait", "motion_extractor.pth")
+    checkpoint_W: str = os.path.join(MODELS_DIR, "liveportrait", "warping_module.pth")
+    checkpoint_G: str = os.path.join(MODELS_DIR, "liveportrait", "spade_generator.pth")
+    checkpoint_S: str = os.path.join(MODELS_DIR, "liveportrait", "stitching_retargeting_module.pth")
 
     # Device configuration
     use_cpu: bool = False  # If True, force CPU usage regardless of CUDA availability
     device_id: str = None  # Will be set based on use_cpu and CUDA availability
+    device: torch.device = field(init=False)  # torch.device(device_id), built once in __post_init__
     flag_use_half_precision: bool = None  # Will be set based on device
+    half_dtype: torch.dtype = None  # Reduced precision dtype for autocast, set based on device
     
     def __post_init__(self):
-        import torch
-        import os
-        
-        # Check environment variable for CPU forcing
-        force_cpu = os.environ.get('FACEPOKE_FORCE_CPU', '0') == '1'
-        self.use_cpu = self.use_cpu or force_cpu
-        
-        # Set device based on use_cpu flag and available accelerators
-        if self.use_cpu:
-            self.device_id = "cpu"
-            logger.info("🔧 Forcing CPU usage as requested")
-        elif torch.backends.mps.is_available():
-            self.device_id = "mps"
-            logger.info("🚀 Using MPS (Metal Performance Shaders) for Apple Silicon")
-        elif torch.cuda.is_available():
-            self.device_id = "cuda"
-            logger.info("🚀 Using CUDA GPU")
-        else:
-            self.device_id = "cpu"
-            logger.info("🚀 Using CPU (no GPU acceleration available)")
+        # Set device based on use_cpu flag and available accelerators (probed once per process)
+        self.device_id = resolve_device(self.use_cpu)
+        self.device = torch.device(self.device_id)
         
         # Enable half precision only on GPU (CUDA or MPS)
         self.flag_use_half_precision = (self.device_id in ["cuda", "mps"])
 
+        # fp16 on CUDA; bf16 on MPS where the OS supports it (wider op coverage than fp16 there)
+        self.half_dtype = torch.float16
+        if self.device_id == "mps":
+            try:
+                # autocast only warns (and turns itself off) on a dtype it can't run, so the
+                # probe enters it with warnings raised to catch torch/macOS combos that lack bf16
+                with warnings.catch_warnings():
+                    warnings.simplefilter("error")
+                    with torch.autocast(device_type="mps", dtype=torch.bfloat16):
+                        x = torch.ones(1, 1, device="mps")
+                        x @ x
+                self.half_dtype = torch.bfloat16
+            except (RuntimeError, TypeError, UserWarning):
+                logger.info("bfloat16 autocast is not supported on this MPS device, using float16")
+
     flag_lip_zero: bool = True  # whether let the lip to close state before animation, only take effect when flag_eye_retargeting and flag_lip_retargeting is False
     lip_zero_threshold: float = 0.03
 
@@ -75,12 +79,11 @@ class InferenceConfig(PrintableConfig):
 
     flag_write_result: bool = True  # whether to write output video
     flag_pasteback: bool = True  # whether to paste-back/stitch the animated face cropping from the face-cropping space to the original image space
-    mask_crop = None
+    mask_crop: Optional[np.ndarray] = None  # paste-back mask in crop space, None loads the default template
     flag_write_gif: bool = False
     size_gif: int = 256
     ref_max_shape: int = 1280
     ref_shape_n: int = 2
 
-    device_id: int = 0
     flag_do_crop: bool = False  # whether to crop the source portrait to the face-cropping space
     flag_do_rot: bool = True  # whether to conduct the rotation when flag_do_crop is True
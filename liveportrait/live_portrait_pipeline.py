@@ -42,7 +42,7 @@ class LivePortraitPipeline(object):
             log("  ✅ LivePortraitWrapper created")
             
             log("  ⏳ Creating Cropper...")
-            self.cropper = Cropper(crop_cfg=crop_cfg)
+            self.cropper = Cropper(crop_cfg=crop_cfg, use_cpu=inference_cfg.use_cpu)
             log("  ✅ Cropper created")
             
             log("✅ LivePortraitPipeline initialized successfully")
@@ -133,7 +133,7 @@ class LivePortraitPipeline(object):
                 R_new = R_d_i
                 delta_new = x_d_i_info['exp']
                 scale_new = x_s_info['scale']
-                t_new = x_d_i_info['t']
+                t_new = x_d_i_info['t'].clone()  # get_kp_info returns inference tensors, which can't be updated in place here
 
             t_new[..., 2].fill_(0) # zero tz
             x_d_i_new = scale_new * (x_c_s @ R_new + delta_new) + t_new
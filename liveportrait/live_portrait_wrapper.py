@@ -63,6 +63,11 @@ class LivePortraitWrapper(object):
         self.device_id = cfg.device_id
         self.timer = Timer()
 
+    def _amp_ctx(self):
+        """ mixed precision context for the model forwards (cfg.half_dtype on GPU, a no-op otherwise)
+        """
+        return torch.autocast(device_type=self.device_id, dtype=self.cfg.half_dtype, enabled=bool(self.cfg.flag_use_half_precision))
+
     def update_config(self, user_args):
         for k, v in user_args.items():
             if hasattr(self.cfg, k):
@@ -110,8 +115,8 @@ class LivePortraitWrapper(object):
         """ get the appearance feature of the image by F
         x: Bx3xHxW, normalized to 0~1
         """
-        with torch.no_grad():
-            with torch.autocast(device_type=self.device_id, dtype=torch.float16 if self.cfg.flag_use_half_precision else torch.float32):
+        with torch.inference_mode():
+            with self._amp_ctx():
                 feature_3d = self.appearance_feature_extractor(x)
 
         return feature_3d.float()
@@ -122,8 +127,8 @@ class LivePortraitWrapper(object):
         flag_refine_info: whether to trandform the pose to degrees and the dimention of the reshape
         return: A dict contains keys: 'pitch', 'yaw', 'roll', 't', 'exp', 'scale', 'kp'
         """
-        with torch.no_grad():
-            with torch.autocast(device_type=self.device_id, dtype=torch.float16 if self.cfg.flag_use_half_precision else torch.float32):
+        with torch.inference_mode():
+            with self._amp_ctx():
                 kp_info = self.motion_extractor(x)
 
             if self.cfg.flag_use_half_precision:
@@ -208,7 +213,7 @@ class LivePortraitWrapper(object):
         """
         feat_eye = concat_feat(kp_source, eye_close_ratio)
 
-        with torch.no_grad():
+        with torch.inference_mode():
             delta = self.stitching_retargeting_module['eye'](feat_eye)
 
         return delta
@@ -220,7 +225,7 @@ class LivePortraitWrapper(object):
         """
         feat_lip = concat_feat(kp_source, lip_close_ratio)
 
-        with torch.no_grad():
+        with torch.inference_mode():
             delta = self.stitching_retargeting_module['lip'](feat_lip)
 
         return delta
@@ -233,10 +238,11 @@ class LivePortraitWrapper(object):
         """
         feat_stiching = concat_feat(kp_source, kp_driving)
 
-        with torch.no_grad():
-            delta = self.stitching_retargeting_module['stitching'](feat_stiching)
+        with torch.inference_mode():
+            with self._amp_ctx():
+                delta = self.stitching_retargeting_module['stitching'](feat_stiching)
 
-        return delta
+        return delta.float()
 
     def stitching(self, kp_source: torch.Tensor, kp_driving: torch.Tensor) -> torch.Tensor:
         """ conduct the stitching
@@ -268,8 +274,8 @@ class LivePortraitWrapper(object):
         kp_driving: BxNx3
         """
         # The line 18 in Algorithm 1: D(W(f_s; x_s, x′_d,i)）
-        with torch.no_grad():
-            with torch.autocast(device_type=self.device_id, dtype=torch.float16 if self.cfg.flag_use_half_precision else torch.float32):
+        with torch.inference_mode():
+            with self._amp_ctx():
                 # get decoder input
                 ret_dct = self.warping_module(feature_3d, kp_source=kp_source, kp_driving=kp_driving)
                 # decode
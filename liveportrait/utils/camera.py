@@ -18,8 +18,8 @@ def headpose_pred_to_degree(pred):
     if pred.ndim > 1 and pred.shape[1] == 66:
         # NOTE: note that the average is modified to 97.5
         device = pred.device
-        idx_tensor = [idx for idx in range(0, 66)]
-        idx_tensor = torch.FloatTensor(idx_tensor).to(device)
+        # built directly on the device, no host tensor + H2D copy per call
+        idx_tensor = torch.arange(66, dtype=torch.float32, device=device)
         pred = F.softmax(pred, dim=1)
         degree = torch.sum(pred*idx_tensor, axis=1) * 3 - 97.5
 
@@ -49,8 +49,8 @@ def get_rotation_matrix(pitch_, yaw_, roll_):
 
     # calculate the euler matrix
     bs = pitch.shape[0]
-    ones = torch.ones([bs, 1]).to(device)
-    zeros = torch.zeros([bs, 1]).to(device)
+    ones = torch.ones([bs, 1], dtype=pitch.dtype, device=device)
+    zeros = torch.zeros([bs, 1], dtype=pitch.dtype, device=device)
     x, y, z = pitch, yaw, roll
 
     rot_x = torch.cat([
@@ -408,5 +408,11 @@ def paste_back(image_to_processed, crop_M_c2o, rgb_ori, mask_ori):
     """
     dsize = (rgb_ori.shape[1], rgb_ori.shape[0])
     result = _transform_img(image_to_processed, crop_M_c2o, dsize=dsize)
-    result = np.clip(mask_ori * result + (1 - mask_ori) * rgb_ori, 0, 255).astype(np.uint8)
-    return result
+    # mask * result + (1 - mask) * ori, rewritten as ori + mask * (result - ori) and
+    # computed in place in a single float32 buffer instead of five full-size temporaries
+    blend = result.astype(np.float32)
+    blend -= rgb_ori
+    blend *= mask_ori
+    blend += rgb_ori
+    np.clip(blend, 0, 255, out=blend)
+    return blend.astype(np.uint8)
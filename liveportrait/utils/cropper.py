@@ -4,7 +4,6 @@ import gradio as gr
 import numpy as np
 import os
 import os.path as osp
-import torch
 from typing import List, Union, Tuple
 from dataclasses import dataclass, field
 import cv2; cv2.setNumThreads(0); cv2.ocl.setUseOpenCL(False)
@@ -15,6 +14,7 @@ from .helper import prefix
 from .crop import crop_image, crop_image_by_bbox, parse_bbox_from_landmark, average_bbox_lst
 from .timer import Timer
 from .rprint import rlog as log
+from .device_resolver import resolve_device
 from .io import load_image_rgb
 from .video import VideoWriter, get_fps, change_video_fps
 
@@ -46,12 +46,12 @@ class Cropper(object):
         
         # ONNX Runtime doesn't have native MPS support, so we use CPU for ONNX operations
         # even when PyTorch is using MPS
-        if use_cpu or (hasattr(torch.backends, 'mps') and torch.backends.mps.is_available()):
+        if resolve_device(use_cpu) == "cuda":
+            onnx_provider = 'CUDAExecutionProvider'
+            providers = ["CUDAExecutionProvider"]
+        else:
             onnx_provider = 'CPUExecutionProvider'
             providers = ["CPUExecutionProvider"]
-        else:
-            onnx_provider = 'CUDAExecutionProvider' if torch.cuda.is_available() else 'CPUExecutionProvider'
-            providers = ["CUDAExecutionProvider"] if torch.cuda.is_available() else ["CPUExecutionProvider"]
         
         self.landmark_runner = LandmarkRunner(
             ckpt_path=make_abs_path(os.path.join(MODELS_DIR, "liveportrait", "landmark.onnx")),
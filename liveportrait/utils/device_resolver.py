@@ -0,0 +1,33 @@
+# coding: utf-8
+
+"""
+resolve the torch device used for inference, once per process
+"""
+
+import logging
+from functools import lru_cache
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=2)
+def resolve_device(force_cpu: bool = False) -> str:
+    """
+    pick the device type for inference: cpu when forced, else mps, cuda, then cpu.
+    the accelerator probes (and the log line) only run on the first call for each value of force_cpu.
+    :param force_cpu: use the cpu regardless of the available accelerators.
+    :return: the device type string ("cpu", "mps" or "cuda").
+    """
+    if force_cpu:
+        logger.info("🔧 Forcing CPU usage as requested")
+        return "cpu"
+    if torch.backends.mps.is_available():
+        logger.info("🚀 Using MPS (Metal Performance Shaders) for Apple Silicon")
+        return "mps"
+    if torch.cuda.is_available():
+        logger.info("🚀 Using CUDA GPU")
+        return "cuda"
+    logger.info("🚀 Using CPU (no GPU acceleration available)")
+    return "cpu"
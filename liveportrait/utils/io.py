@@ -4,7 +4,9 @@ import os
 from glob import glob
 import os.path as osp
 import imageio
+import io
 import numpy as np
+from PIL import Image, ImageOps
 import cv2; cv2.setNumThreads(0); cv2.ocl.setUseOpenCL(False)
 
 
@@ -15,6 +17,35 @@ def load_image_rgb(image_path: str):
     return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
 
+def decode_image_rgb(data: bytes, max_dim=0):
+    """
+    decode encoded image bytes (jpg, png, webp, ...) into a HxWx3 uint8 rgb array.
+    :param data: the encoded image.
+    :param max_dim: the largest dimension the caller will keep, jpgs are decoded directly at the smallest DCT scale still covering it (0 disables this).
+    :return: the decoded image.
+    """
+    image = Image.open(io.BytesIO(data))
+    if max_dim > 0:
+        # only has an effect on jpg, other formats ignore the hint
+        image.draft('RGB', (max_dim, max_dim))
+
+    # keep the exif orientation (fix the selfie issue on iphone)
+    image = ImageOps.exif_transpose(image)
+
+    # convert the image to rgb mode (removes alpha channel if present)
+    image = image.convert('RGB')
+
+    return np.array(image)
+
+
+def decode_and_resize(data: bytes, max_dim=1920, n=2):
+    """
+    decode image bytes and apply resize_to_limit, self-contained so it can run in a worker process.
+    """
+    img = decode_image_rgb(data, max_dim=max_dim)
+    return resize_to_limit(img, max_dim=max_dim, n=n)
+
+
 def load_driving_info(driving_info):
     driving_video_ori = []
 
@@ -6,28 +6,22 @@ import aiohttp
 import requests
 from huggingface_hub import hf_hub_download
 
+from liveportrait.utils.device_resolver import resolve_device
+
 # Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 # Configuration
 DATA_ROOT = os.environ.get('DATA_ROOT', '/tmp/data')
 MODELS_DIR = os.path.join(DATA_ROOT, "models")
 
 # Device selection with MPS support for Apple Silicon
-def get_device():
-    """Get the best available device: MPS > CUDA > CPU"""
-    if torch.backends.mps.is_available():
-        logger.info("🚀 Using MPS (Metal Performance Shaders) for Apple Silicon")
-        return torch.device("mps")
-    elif torch.cuda.is_available():
-        logger.info("🚀 Using CUDA GPU")
-        return torch.device("cuda")
-    else:
-        logger.info("🚀 Using CPU (no GPU acceleration available)")
-        return torch.device("cpu")
-
-DEVICE = get_device()
+# (resolved lazily, once the force_cpu flag is known: resolve_device memoizes per flag)
+def get_device(force_cpu: bool = False):
+    """Get the best available device: MPS > CUDA > CPU, or the CPU if force_cpu is set"""
+    return torch.device(resolve_device(force_cpu))
 
 # Hugging Face repository information
 HF_REPO_ID = "jbilcke-hf/model-cocktail"
@@ -131,12 +125,12 @@ async def download_all_models():
 class ModelLoader:
     """A class responsible for loading and initializing all required models."""
 
-    def __init__(self):
-        self.device = DEVICE
+    def __init__(self, force_cpu: bool = False):
+        self.device = get_device(force_cpu)
         self.models_dir = MODELS_DIR
 
-    async def load_live_portrait(self):
-        """Load LivePortrait models."""
+    async def load_live_portrait(self, force_cpu: bool = False):
+        """Load LivePortrait models, on the CPU if force_cpu is set."""
         from liveportrait.config.inference_config import InferenceConfig
         from liveportrait.config.crop_config import CropConfig
         from liveportrait.live_portrait_pipeline import LivePortraitPipeline
@@ -145,6 +139,7 @@ class ModelLoader:
         try:
             logger.info("    ⏳ Creating inference config...")
             inference_cfg = InferenceConfig(
+                use_cpu=force_cpu,
                 # default values
                 flag_stitching=True,  # we recommend setting it to True!
                 flag_relative=True,  # whether to use relative motion
@@ -170,7 +165,7 @@ class ModelLoader:
             logger.error(f"Failed to load LivePortrait models: {str(e)}")
             raise
 
-async def initialize_models():
+async def initialize_models(force_cpu: bool = False):
     """Initialize and load all required models."""
     logger.info("🚀 Starting model initialization...")
 
@@ -178,10 +173,10 @@ async def initialize_models():
     await download_all_models()
 
     # Initialize the ModelLoader
-    loader = ModelLoader()
+    loader = ModelLoader(force_cpu=force_cpu)
 
     # Load LivePortrait models
-    live_portrait = await loader.load_live_portrait()
+    live_portrait = await loader.load_live_portrait(force_cpu=force_cpu)
 
     logger.info("✅ Model initialization completed.")
     return live_portrait
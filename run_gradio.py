@@ -3,7 +3,6 @@
 Simple startup script for FacePoke Gradio interface
 """
 
-import os
 import sys
 import argparse
 
@@ -15,17 +14,20 @@ def main():
     
     args = parser.parse_args()
     
-    # Set environment variables
+    # Import and run the Gradio app
+    import gradio_app
+    from gradio_app import create_interface, start_model_initialization
+    
     if args.cpu:
-        os.environ['FACEPOKE_FORCE_CPU'] = '1'
+        gradio_app.FORCE_CPU = True
         print("🔧 Forcing CPU usage as requested")
     
-    # Import and run the Gradio app
-    from gradio_app import create_interface
-    
     print("🚀 Starting FacePoke Gradio interface...")
     print(f"📡 Interface will be available at: http://localhost:{args.port}")
     
+    # Load the models while the server starts, instead of on the first page load
+    start_model_initialization()
+    
     interface = create_interface()
     interface.launch(
         server_name="0.0.0.0",